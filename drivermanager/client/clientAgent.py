@@ -4,24 +4,38 @@ import asyncio
 import platform
 import logging
 import ssl
+import shutil
+import tempfile
+from urllib.parse import quote
 from typing import List, Optional
 import websockets
-from driverInstaller import install_drivers, install_driver, InstallResult
+from driverInstaller import install_drivers, install_driver, install_verified_driver, InstallResult
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 INSECURE_TLS = True
 RECONNECT_DELAY_INITIAL = 5.0
+# Интервал heartbeat до получения значения от мастера
+HEARTBEAT_INTERVAL_DEFAULT = 5.0
 
 class ClientAgent:
     logger = logging.getLogger("clientAgent")
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s - %(message)s")
 
-    def __init__(self, host: str = 'localhost', port: int = 8765):
+    def __init__(self, host: str = 'localhost', port: int = 8765, http_port: int = 8766):
         self.host = host
         self.port = port
+        self.http_port = http_port
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self.running = False
         self.reconnectDelay = RECONNECT_DELAY_INITIAL
         self.currentOS = platform.system().lower()
+        self.heartbeatInterval = HEARTBEAT_INTERVAL_DEFAULT
+        self.heartbeatWakeup = asyncio.Event()
+        self.installLock = asyncio.Lock()
+        self.installTasks = set()
 
         # build uri
         scheme = "ws"
@@ -44,7 +58,7 @@ class ClientAgent:
             self.websocket = await websockets.connect(self.uri, ssl=self.ssl_context)
             self.running = True
             # сразу отправляем информацию о клиенте
-            await self.send({"os": self.currentOS})
+            await self.send({"os": self.currentOS, "name": platform.node()})
             self.logger.info("Connected to %s", self.uri)
             return True
         except Exception as e:
@@ -57,11 +71,17 @@ class ClientAgent:
         """
         Ожидаемый формат сообщения:
         {
-            "file": "path/to/driver.ext"
+            "file": "path/to/driver.ext",
+            "manifest": {"size": ..., "sha256": ..., "chunk_size": ..., "chunks": [...]}  (необязательно)
         }
 
         Клиент получает путь к одному файлу драйвера и выполняет установку.
+        Служебное сообщение мастера {"heartbeat_interval": 30.0} меняет интервал heartbeat.
         """
+        if "heartbeat_interval" in data:
+            self.heartbeatInterval = float(data["heartbeat_interval"])
+            self.logger.info("Heartbeat interval set to %.1f seconds", self.heartbeatInterval)
+            return
         try:
             # Получаем путь к файлу из JSON
             driver_path = data.get("file")
@@ -70,13 +90,54 @@ class ClientAgent:
             if not driver_path or not isinstance(driver_path, str):
                 self.logger.warning("Invalid or missing 'file' attribute in payload")
                 return
-            self.logger.info(f"Starting installation of driver: {driver_path}")
-            
-            # Выполняем установку драйвера
-            install_driver(driver_path)
+            # Установка идёт в фоне, чтобы цикл приёма и heartbeat не блокировались
+            task = asyncio.create_task(self.install(driver_path, data.get("manifest")))
+            self.installTasks.add(task)
+            task.add_done_callback(self.installTasks.discard)
         except Exception as e:
             self.logger.exception("Error handling driver installation")
 
+    async def install(self, driver_path: str, manifest: Optional[dict] = None):
+        # установки выполняются по очереди
+        async with self.installLock:
+            self.logger.info(f"Starting installation of driver: {driver_path}")
+            self.heartbeatWakeup.set()
+            try:
+                # Выполняем установку драйвера в отдельном потоке
+                payload_url = f"http://{self.host}:{self.http_port}/payload?file={quote(driver_path)}"
+                result = await asyncio.to_thread(install_verified_driver, driver_path, manifest,
+                                                 payload_url=payload_url)
+                self.logger.info("Installation result for %s: %s", driver_path, result.as_dict())
+            except Exception:
+                self.logger.exception("Error handling driver installation")
+        self.heartbeatWakeup.set()
+
+    def busy(self) -> bool:
+        return self.installLock.locked()
+
+    # Лёгкая сводка о состоянии клиента для мастера
+    def health(self) -> dict:
+        cpu = None
+        if psutil is not None:
+            cpu = psutil.cpu_percent(interval=None) / 100.0
+        elif hasattr(os, "getloadavg"):
+            cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+        try:
+            disk_free = shutil.disk_usage(tempfile.gettempdir()).free
+        except OSError:
+            disk_free = None
+        return {"cpu": cpu, "disk_free": disk_free, "busy": self.busy()}
+
+    async def heartbeat_loop(self):
+        # heartbeat уходит раз в интервал, а также сразу при смене состояния установщика
+        while self.running:
+            self.heartbeatWakeup.clear()
+            await self.send({"heartbeat": self.health()})
+            try:
+                await asyncio.wait_for(self.heartbeatWakeup.wait(), self.heartbeatInterval)
+            except asyncio.TimeoutError:
+                pass
+
 
     async def send(self, data: dict) -> bool:
         if self.websocket is None:
@@ -113,7 +174,9 @@ class ClientAgent:
             if connected:
                 # сброс задержки при успешном подключении
                 self.reconnectDelay = RECONNECT_DELAY_INITIAL
+                heartbeat = asyncio.create_task(self.heartbeat_loop())
                 await self.receive_loop()
+                heartbeat.cancel()
             else:
                 self.logger.info("Connect failed, will retry in %.1f seconds", self.reconnectDelay)
 
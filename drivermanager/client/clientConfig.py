@@ -1,2 +1,3 @@
 PORT = 8765
+HTTP_PORT = 8766
 HOST = "localhost"
@@ -11,6 +11,8 @@
       .deb  -> sudo dpkg -i <file> (и попытка apt-get -f install при ошибке)
       .run  -> sudo bash <file>
       .tar* -> распаковать tar -> если в распаковке есть install.sh или setup.sh, запустить
+
+Если мастер прислал манифест, payload перед установкой проверяется (см. payloadVerifier)
 """
 
 import os
@@ -20,13 +22,21 @@ import logging
 from pathlib import Path
 from typing import List, Dict, Optional
 import shutil
+import tempfile
 import fileManager as fm
+import payloadVerifier as pv
 
 LOGGER_NAME = "driver_installer"
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
 logger = logging.getLogger(LOGGER_NAME)
 
 DEFAULT_INSTALL_TIMEOUT = 300
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "driver_staging")
+# Отказывать в установке пакетов, подпись которых не удалось подтвердить
+REQUIRE_SIGNATURE = False
+# Расширения, которые проверяются и устанавливаются на месте: рядом с ними лежат нужные им файлы
+# (.sys/.cat для .inf, внешние .cab для .msi, содержимое пакета setup.exe)
+IN_PLACE_EXTENSIONS = {".inf", ".msi", ".exe"}
 
 # ---------- Выполнение команд / установка ----------
 class InstallResult:
@@ -158,6 +168,52 @@ def install_driver(file_path: str, installer_args: Optional[List[str]] = None) -
         return InstallResult(False, reason=f"Unsupported platform: {system}")
 
 
+def install_verified_driver(file_path: str, manifest: Optional[Dict] = None,
+                            installer_args: Optional[List[str]] = None,
+                            payload_url: Optional[str] = None) -> InstallResult:
+    """
+    Проверяет payload по манифесту мастера и подпись поставщика, затем устанавливает.
+    Файл копируется в STAGING_DIR с проверкой на лету; файлы из IN_PLACE_EXTENSIONS
+    проверяются на месте, так как им нужны соседние файлы пакета.
+    payload_url - адрес раздачи файла мастером: используется, если файл недоступен
+    по пути, и для перезапроса повреждённых блоков.
+    """
+    if manifest is None:
+        return install_driver(file_path, installer_args)
+    local = os.path.exists(file_path)
+    if not local and payload_url is None:
+        return InstallResult(False, reason="file_not_found")
+
+    ext = fm.get_extension(file_path)
+    dest = None
+    if ext not in IN_PLACE_EXTENSIONS or not local:
+        os.makedirs(STAGING_DIR, exist_ok=True)
+        # путь может быть в формате другой ОС (C:\... на мастере)
+        dest = os.path.join(STAGING_DIR, file_path.replace("\\", "/").rsplit("/", 1)[-1])
+    # перезапрошенные у мастера блоки нужно куда-то записать, поэтому только при копировании
+    fetch_chunk = None
+    if payload_url and dest is not None:
+        fetch_chunk = pv.http_chunk_fetcher(payload_url, manifest["chunk_size"])
+    try:
+        staged = pv.stage_payload(file_path, manifest, dest, fetch_chunk, None if local else payload_url)
+        verified, detail = pv.verify_signature(staged, ext)
+    except pv.VerificationError as e:
+        logger.error("Verification of %s failed: %s", file_path, e.reason)
+        return InstallResult(False, reason=f"verification_failed: {e.reason}")
+    except OSError as e:
+        logger.error("Verification of %s failed: %s", file_path, e)
+        return InstallResult(False, reason="verification_failed", stderr=str(e))
+
+    try:
+        logger.info("Signature check for %s: %s", file_path, detail)
+        if verified is False or (verified is None and REQUIRE_SIGNATURE):
+            return InstallResult(False, reason=f"signature_rejected: {detail}")
+        return install_driver(staged, installer_args)
+    finally:
+        if dest is not None and os.path.exists(dest):
+            os.remove(dest)
+
+
 # ---------- Пакетная установка ----------
 def install_drivers(files: List[str], common_installer_args: Optional[List[str]] = None) -> Dict[str, Dict]:
     """
@@ -2,7 +2,7 @@ from clientAgent import ClientAgent
 import clientConfig as cfg 
 import asyncio
 if __name__ == "__main__":
-    client = ClientAgent(cfg.HOST, cfg.PORT)
+    client = ClientAgent(cfg.HOST, cfg.PORT, cfg.HTTP_PORT)
     try:
         asyncio.run(client.run())
     except KeyboardInterrupt:
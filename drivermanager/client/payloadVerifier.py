@@ -0,0 +1,262 @@
+"""
+Проверка payload драйвера перед установкой
+
+Манифест от мастера:
+  {"size": <байт>, "sha256": <hex>, "chunk_size": <байт>, "chunks": [<hex sha256 блока>, ...]}
+
+Этапы:
+  - проверка свободного места перед копированием во временный каталог;
+  - копирование блоками с хэшированием на лету (без повторного чтения файла),
+    повреждённый блок сразу перечитывается из источника, при неудаче - отказ;
+  - проверка подписи поставщика:
+      .exe/.msi -> Get-AuthenticodeSignature (Windows)
+      .deb      -> debsig-verify / dpkg-sig, без них - разбор ar-архива
+      .rpm      -> rpm -K, без него - разбор заголовка подписи RPM
+
+Если файл недоступен клиенту по пути, payload скачивается с мастера (GET /payload),
+оттуда же перезапрашиваются отдельные повреждённые блоки.
+"""
+
+import os
+import re
+import struct
+import hashlib
+import logging
+import platform
+import shutil
+import subprocess
+import urllib.request
+from typing import Optional, Tuple, Callable
+
+LOGGER_NAME = "payload_verifier"
+logger = logging.getLogger(LOGGER_NAME)
+
+# Сколько раз перезапрашивать повреждённый блок
+CHUNK_RETRIES = 3
+# Запас свободного места сверх размера payload (распаковка, логи установщика)
+FREE_SPACE_MARGIN = 64 * 1024 * 1024
+SIGNATURE_TIMEOUT = 60
+HTTP_TIMEOUT = 30
+
+RPM_LEAD_MAGIC = b"\xed\xab\xee\xdb"
+RPM_HEADER_MAGIC = b"\x8e\xad\xe8"
+# RPMSIGTAG_DSA, RPMSIGTAG_RSA, RPMSIGTAG_PGP, RPMSIGTAG_GPG, RPMSIGTAG_PGP5
+RPM_SIGNATURE_TAGS = {267, 268, 1002, 1005, 1006}
+AR_MAGIC = b"!<arch>\n"
+# Коды выхода debsig-verify: подпись неверна (DS_FAIL_BADSIG). Остальные ненулевые коды
+# (нет подписи, неизвестный издатель, нет политики, внутренняя ошибка) не означают повреждения
+DEBSIG_BADSIG = 13
+# Строки "rpm -Kv" вида "Header SHA256 digest: BAD" / "Header V4 RSA/SHA256 Signature, key ID ...: NOKEY"
+RPM_CHECK_BAD = re.compile(r":\s*BAD\b")
+RPM_SIGNATURE_OK = re.compile(r"Signature.*:\s*OK\b")
+# Статусы Get-AuthenticodeSignature, означающие повреждённую или подменённую подпись.
+# NotTrusted, UnknownError и т.п. (недоверенная цепочка) считаются непроверенными
+AUTHENTICODE_INVALID = {"HashMismatch", "NotSupportedFileFormat", "Incompatible"}
+
+
+class VerificationError(Exception):
+    def __init__(self, reason: str, bad_chunk: Optional[int] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.bad_chunk = bad_chunk
+
+
+def check_free_space(directory: str, size: int):
+    free = shutil.disk_usage(directory).free
+    if free < size + FREE_SPACE_MARGIN:
+        raise VerificationError(f"not_enough_space: need {size + FREE_SPACE_MARGIN}, free {free}")
+
+
+def _read_chunk(source: str, index: int, chunk_size: int) -> bytes:
+    with open(source, "rb") as f:
+        f.seek(index * chunk_size)
+        return f.read(chunk_size)
+
+
+def open_payload_url(url: str):
+    return urllib.request.urlopen(url, timeout=HTTP_TIMEOUT)
+
+
+# Перезапрос одного блока у мастера
+def http_chunk_fetcher(url: str, chunk_size: int) -> Callable[[int], bytes]:
+    def fetch_chunk(index: int) -> bytes:
+        try:
+            with open_payload_url(f"{url}&chunk={index}&chunk_size={chunk_size}") as resp:
+                return resp.read()
+        except OSError as e:
+            logger.warning("Failed to re-fetch chunk %d from %s: %s", index, url, e)
+            return b""
+    return fetch_chunk
+
+
+def stage_payload(source: str, manifest: dict, dest: Optional[str] = None,
+                  fetch_chunk: Callable[[int], bytes] = None, url: Optional[str] = None) -> str:
+    """
+    Копирует source в dest, сверяя каждый блок с манифестом по мере чтения.
+    Если dest не задан, файл только проверяется на месте: повреждённый блок лишь перечитывается
+    из source, так как полученные извне байты не попали бы в устанавливаемый файл.
+    url - адрес раздачи мастером, из которого читается содержимое вместо source.
+    fetch_chunk(index) используется для перезапроса отдельного блока (по умолчанию - повторное чтение source).
+    Возвращает путь к проверенному файлу, при ошибке бросает VerificationError.
+    """
+    size = manifest["size"]
+    chunk_size = manifest["chunk_size"]
+    expected = manifest["chunks"]
+    if fetch_chunk is None or dest is None:
+        fetch_chunk = lambda index: _read_chunk(source, index, chunk_size)
+
+    if url is None:
+        actual_size = os.path.getsize(source)
+        if actual_size != size:
+            raise VerificationError(f"size_mismatch: expected {size}, got {actual_size}")
+    if dest is not None:
+        check_free_space(os.path.dirname(dest), size)
+
+    total = hashlib.sha256()
+    out = open(dest, "wb") if dest is not None else None
+    try:
+        with open_payload_url(url) if url is not None else open(source, "rb") as src:
+            for index, chunk_hash in enumerate(expected):
+                data = src.read(chunk_size)
+                retries = 0
+                while hashlib.sha256(data).hexdigest() != chunk_hash:
+                    if retries >= CHUNK_RETRIES:
+                        raise VerificationError(f"chunk_corrupted: {index}", bad_chunk=index)
+                    retries += 1
+                    logger.warning("Chunk %d of %s is corrupted, re-fetching (attempt %d)", index, source, retries)
+                    data = fetch_chunk(index)
+                total.update(data)
+                if out is not None:
+                    out.write(data)
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.remove(dest)
+        raise
+    if out is not None:
+        out.close()
+
+    if total.hexdigest() != manifest["sha256"]:
+        if dest is not None:
+            os.remove(dest)
+        raise VerificationError("sha256_mismatch")
+    logger.info("Payload %s verified (%d bytes, %d chunks)", source, size, len(expected))
+    return dest if dest is not None else source
+
+
+# ---------- Подписи ----------
+def _run_tool(cmd) -> Optional[subprocess.CompletedProcess]:
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=SIGNATURE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Signature tool %s failed: %s", cmd[0], e)
+        return None
+
+
+def _verify_authenticode(file_path: str) -> Tuple[Optional[bool], str]:
+    if not platform.system().lower().startswith("win"):
+        return None, "authenticode_unavailable"
+    quoted = file_path.replace("'", "''")
+    cmd = ["powershell", "-NoProfile", "-Command",
+           f"(Get-AuthenticodeSignature -LiteralPath '{quoted}').Status"]
+    proc = _run_tool(cmd)
+    if proc is None or proc.returncode != 0:
+        return None, "authenticode_unavailable"
+    status = proc.stdout.strip()
+    if status == "Valid":
+        return True, "authenticode_valid"
+    if status == "NotSigned":
+        return None, "unsigned"
+    if status in AUTHENTICODE_INVALID:
+        return False, f"authenticode_{status.lower()}"
+    return None, f"authenticode_{status.lower() or 'unknown'}"
+
+
+def _deb_members(file_path: str):
+    with open(file_path, "rb") as f:
+        if f.read(len(AR_MAGIC)) != AR_MAGIC:
+            raise VerificationError("deb_malformed")
+        while True:
+            header = f.read(60)
+            if len(header) < 60:
+                return
+            name = header[:16].decode("ascii", "replace").strip().rstrip("/")
+            size = int(header[48:58].decode("ascii").strip())
+            yield name
+            f.seek(size + size % 2, os.SEEK_CUR)
+
+
+def _verify_deb(file_path: str) -> Tuple[Optional[bool], str]:
+    if shutil.which("debsig-verify"):
+        proc = _run_tool(["debsig-verify", file_path])
+        if proc is not None:
+            if proc.returncode == 0:
+                return True, "debsig_valid"
+            if proc.returncode == DEBSIG_BADSIG:
+                return False, "debsig_invalid"
+            logger.info("debsig-verify could not verify %s (exit code %d)", file_path, proc.returncode)
+    if shutil.which("dpkg-sig"):
+        proc = _run_tool(["dpkg-sig", "--verify", file_path])
+        if proc is not None:
+            if "GOODSIG" in proc.stdout:
+                return True, "dpkg_sig_valid"
+            if "BADSIG" in proc.stdout:
+                return False, "dpkg_sig_invalid"
+    try:
+        members = list(_deb_members(file_path))
+    except (OSError, ValueError):
+        raise VerificationError("deb_malformed")
+    if "debian-binary" not in members:
+        raise VerificationError("deb_malformed")
+    if any(m.startswith("_gpg") for m in members):
+        return None, "signed_not_verified"
+    return None, "unsigned"
+
+
+def _rpm_signature_tags(file_path: str):
+    with open(file_path, "rb") as f:
+        lead = f.read(96)
+        if len(lead) < 96 or lead[:4] != RPM_LEAD_MAGIC:
+            raise VerificationError("rpm_malformed")
+        header = f.read(16)
+        if len(header) < 16 or header[:3] != RPM_HEADER_MAGIC:
+            raise VerificationError("rpm_malformed")
+        nindex, _ = struct.unpack(">II", header[8:16])
+        entries = f.read(nindex * 16)
+        if len(entries) < nindex * 16:
+            raise VerificationError("rpm_malformed")
+        return {struct.unpack(">I", entries[i:i + 4])[0] for i in range(0, len(entries), 16)}
+
+
+def _verify_rpm(file_path: str) -> Tuple[Optional[bool], str]:
+    if shutil.which("rpm"):
+        proc = _run_tool(["rpm", "-Kv", file_path])
+        if proc is not None:
+            output = proc.stdout + proc.stderr
+            # отказ только при неверной подписи или контрольной сумме; NOKEY (ключ поставщика
+            # не импортирован) и прочие "не удалось проверить" - непроверенный пакет
+            if RPM_CHECK_BAD.search(output):
+                return False, "rpm_checksig_failed"
+            if proc.returncode == 0 and RPM_SIGNATURE_OK.search(output):
+                return True, "rpm_signature_valid"
+            if proc.returncode != 0:
+                logger.info("rpm could not verify %s: %s", file_path, output.strip())
+    tags = _rpm_signature_tags(file_path)
+    if tags & RPM_SIGNATURE_TAGS:
+        return None, "signed_not_verified"
+    return None, "unsigned"
+
+
+def verify_signature(file_path: str, ext: str) -> Tuple[Optional[bool], str]:
+    """
+    Возвращает (True, ...) - подпись верна, (False, ...) - подпись неверна,
+    (None, ...) - проверить не удалось или файл не подписан.
+    Структурно повреждённый пакет вызывает VerificationError.
+    """
+    if ext in (".exe", ".msi"):
+        return _verify_authenticode(file_path)
+    if ext == ".deb":
+        return _verify_deb(file_path)
+    if ext == ".rpm":
+        return _verify_rpm(file_path)
+    return None, "no_signature_check"
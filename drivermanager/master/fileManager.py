@@ -1,4 +1,8 @@
 import os
+import hashlib
+
+# Размер блока, по которому клиенты проверяют и перезапрашивают payload
+CHUNK_SIZE = 1024 * 1024
 
 extensionToOperatingSystem = {
     ".exe": {"windows"},
@@ -26,4 +30,40 @@ def target_os_ext(ext):
     return empty_set
 
 def matches(ext, os):
-    return os in target_os_ext(ext)  
+    return os in target_os_ext(ext)
+
+# путь -> ((размер, mtime, chunk_size), манифест)
+_manifest_cache = {}
+
+# Манифест файла для проверки на клиенте: размер, sha256 всего файла и каждого блока.
+# Кэшируется по пути и пересчитывается при изменении размера или mtime файла
+def manifest(file_path, chunk_size=CHUNK_SIZE):
+    st = os.stat(file_path)
+    version = (st.st_size, st.st_mtime_ns, chunk_size)
+    cached = _manifest_cache.get(file_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    _prune_manifests()
+    total = hashlib.sha256()
+    chunks = []
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            total.update(data)
+            chunks.append(hashlib.sha256(data).hexdigest())
+    result = {
+        "size": st.st_size,
+        "sha256": total.hexdigest(),
+        "chunk_size": chunk_size,
+        "chunks": chunks
+    }
+    _manifest_cache[file_path] = (version, result)
+    return result
+
+# Удаление из кэша манифестов удалённых файлов; вызывается только при пересчёте, который и так читает файл целиком
+def _prune_manifests():
+    for path in list(_manifest_cache):
+        if not os.path.exists(path):
+            del _manifest_cache[path]
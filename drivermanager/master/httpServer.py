@@ -2,6 +2,9 @@ import asyncio
 import json
 import logging
 from aiohttp import web
+from payloadCache import PayloadCache
+from serverConfig import PAYLOAD_CACHE_BYTES
+import fileManager as fm
 
 class HttpServer:
     def __init__(self, logger : logging.Logger, host = 'localhost', http_port=8766):
@@ -9,11 +12,52 @@ class HttpServer:
         self.host = host
         self.http_port = http_port
         self.http_app = web.Application()
+        self.payloads = PayloadCache(logger, PAYLOAD_CACHE_BYTES)
+        self.setup_get('/payload', self.serve_payload)
 
     # Регистрация HTTP-эндпоинтов
     def setup_post(self, name, handler):
         self.http_app.router.add_post(name, handler)
+
+    def setup_get(self, name, handler):
+        self.http_app.router.add_get(name, handler)
         
+    # GET /payload?file=<путь>[&chunk=N&chunk_size=M]
+    # Без chunk файл отдаётся целиком через sendfile (с поддержкой Range),
+    # с chunk - один блок срезом общего для всех загрузок отображения файла
+    async def serve_payload(self, request):
+        path = request.query.get('file')
+        if not self.payloads.is_published(path):
+            return web.Response(text="Payload not found", status=404)
+        if 'chunk' not in request.query:
+            return web.FileResponse(path)
+        try:
+            index = int(request.query['chunk'])
+            chunk_size = int(request.query.get('chunk_size', fm.CHUNK_SIZE))
+            if index < 0 or chunk_size <= 0:
+                raise ValueError
+        except ValueError:
+            return web.Response(text="Invalid chunk", status=400)
+        try:
+            entry = self.payloads.acquire(path)
+        except OSError as e:
+            self.logger.warning(f"Cannot map payload \"{path}\": {e}")
+            return web.Response(text="Payload not found", status=404)
+        try:
+            start = index * chunk_size
+            if start >= entry.size:
+                return web.Response(text="Chunk out of range", status=416)
+            end = min(start + chunk_size, entry.size)
+            response = web.StreamResponse(headers={'Content-Type': 'application/octet-stream'})
+            response.content_length = end - start
+            await response.prepare(request)
+            with entry.view[start:end] as data:
+                await response.write(data)
+            await response.write_eof()
+            return response
+        finally:
+            self.payloads.release(entry)
+
     # Запуск HTTP сервера
     async def start(self):
         self.runner = web.AppRunner(self.http_app)
@@ -24,4 +68,5 @@ class HttpServer:
     
     async def terminate(self):
         self.runner.shutdown()
-        self.site.stop()
\ No newline at end of file
+        self.site.stop()
+        self.payloads.close()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import mmap
+import os
+import logging
+from collections import OrderedDict
+
+class MappedPayload:
+    """Файл, отображённый в память только для чтения; блоки отдаются срезами memoryview без копирования"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        st = os.fstat(self.file.fileno())
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        # mmap не поддерживает файлы нулевой длины
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.view = memoryview(self.map) if self.map is not None else memoryview(b'')
+        self.refs = 0
+        self.evicted = False
+
+    def is_stale(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return True
+        return st.st_size != self.size or st.st_mtime_ns != self.mtime_ns
+
+    # Возвращает False, если отображение ещё используется: транспорт asyncio может держать
+    # срезы неотправленных данных после завершения response.write
+    def close(self):
+        try:
+            self.view.release()
+            if self.map is not None:
+                self.map.close()
+        except BufferError:
+            return False
+        self.file.close()
+        return True
+
+class PayloadCache:
+    """
+    Ограниченный LRU-кэш отображённых в память payload.
+    Все одновременные загрузки одного файла используют одно отображение, страницы
+    которого живут в page cache ОС, поэтому память мастера не растёт с числом клиентов.
+    Отдавать можно только опубликованные через publish файлы.
+    """
+    def __init__(self, logger : logging.Logger, max_bytes):
+        self.logger = logger
+        self.max_bytes = max_bytes
+        self.published = set()
+        self.entries = OrderedDict()
+        self.mapped_bytes = 0
+        # вытесненные отображения, которые не удалось закрыть сразу
+        self.closing = list()
+
+    def publish(self, path):
+        if path not in self.published:
+            # удалённые с диска файлы больше не раздаются
+            self.published = {p for p in self.published if os.path.exists(p)}
+            self.published.add(path)
+
+    def is_published(self, path):
+        if path in self.published and not os.path.exists(path):
+            self.published.discard(path)
+        return path in self.published
+
+    # Получение отображения файла; после использования обязательно вызвать release
+    def acquire(self, path) -> MappedPayload:
+        self._close_pending()
+        entry = self.entries.get(path)
+        if entry is not None and entry.is_stale():
+            self._evict(entry)
+            entry = None
+        if entry is None:
+            entry = MappedPayload(path)
+            self.entries[path] = entry
+            self.mapped_bytes += entry.size
+            self.logger.info(f"Payload \"{path}\" mapped ({entry.size} bytes)")
+        self.entries.move_to_end(path)
+        entry.refs += 1
+        self._shrink()
+        return entry
+
+    def release(self, entry: MappedPayload):
+        entry.refs -= 1
+        if entry.evicted and entry.refs == 0:
+            self._close(entry)
+        self._close_pending()
+
+    # Вытеснение давно не использованных отображений сверх лимита
+    def _shrink(self):
+        for entry in list(self.entries.values()):
+            if self.mapped_bytes <= self.max_bytes:
+                break
+            if entry.refs == 0:
+                self._evict(entry)
+
+    def _evict(self, entry: MappedPayload):
+        # отображение закрывается, когда завершится последняя использующая его загрузка
+        self.entries.pop(entry.path, None)
+        self.mapped_bytes -= entry.size
+        entry.evicted = True
+        if entry.refs == 0:
+            self._close(entry)
+
+    def _close(self, entry: MappedPayload):
+        if not entry.close():
+            self.closing.append(entry)
+
+    def _close_pending(self):
+        if self.closing:
+            self.closing = [entry for entry in self.closing if not entry.close()]
+
+    def close(self):
+        for entry in list(self.entries.values()):
+            self._evict(entry)
+        self._close_pending()
@@ -0,0 +1,294 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Максимальное время сна планировщика: периодически сверяемся с часами,
+# чтобы перевод системного времени не сдвигал срабатывания надолго
+MAX_SLEEP = 60.0
+
+# Диапазоны полей cron-выражения: минута, час, день месяца, месяц, день недели (0 и 7 - воскресенье)
+CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+class CronExpression:
+    """
+    Упрощённый cron: "минута час день_месяца месяц день_недели".
+    Поддерживаются '*', числа, списки (1,2), диапазоны (1-5) и шаг (*/15, 1-30/5, 5/10 = 5-59/10).
+    День недели: 0 или 7 - воскресенье. Время локальное.
+    """
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expr!r}")
+        self.expr = expr
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, CRON_RANGES)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        self.weekdays = {d % 7 for d in self.weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse_field(field, lo, hi):
+        values = set()
+        for part in field.split(','):
+            step = None
+            if '/' in part:
+                part, step_str = part.split('/', 1)
+                step = int(step_str)
+                if step <= 0:
+                    raise ValueError(f"Invalid cron step: {step_str}")
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-', 1))
+            else:
+                start = int(part)
+                # как в cron: "5/10" означает от 5 до конца диапазона с шагом 10
+                end = hi if step is not None else start
+            if start < lo or end > hi or start > end:
+                raise ValueError(f"Cron value out of range {lo}-{hi}: {part}")
+            values.update(range(start, end + 1, step or 1))
+        return values
+
+    def _day_matches(self, t: datetime):
+        weekday = (t.weekday() + 1) % 7
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return weekday in self.weekdays
+        if self.any_weekday:
+            return t.day in self.days
+        # как в cron: если заданы оба поля, достаточно совпадения одного
+        return t.day in self.days or weekday in self.weekdays
+
+    # Ближайший момент срабатывания строго после after
+    def next_after(self, after: datetime) -> datetime:
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never fires: {self.expr!r}")
+
+
+class MaintenanceWindow:
+    """Ежедневное окно обслуживания клиента в локальном времени, может переходить через полночь"""
+    def __init__(self, start: str, end: str):
+        self.start = self._parse_time(start)
+        self.end = self._parse_time(end)
+        # такое окно никогда не открывается, и развертывания откладывались бы бесконечно
+        if self.start == self.end:
+            raise ValueError(f"Maintenance window start and end must differ: {start!r}")
+
+    @staticmethod
+    def _parse_time(value: str):
+        hours, minutes = (int(x) for x in value.split(':'))
+        if not (0 <= hours <= 23 and 0 <= minutes <= 59):
+            raise ValueError(f"Invalid time of day: {value!r}")
+        return hours * 60 + minutes
+
+    def is_open(self, now: datetime):
+        minute = now.hour * 60 + now.minute
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    # Ближайшее открытие окна после now
+    def next_open(self, now: datetime) -> datetime:
+        start = now.replace(hour=self.start // 60, minute=self.start % 60, second=0, microsecond=0)
+        if start <= now:
+            start += timedelta(days=1)
+        return start
+
+    def as_dict(self):
+        return {
+            "start": f"{self.start // 60:02d}:{self.start % 60:02d}",
+            "end": f"{self.end // 60:02d}:{self.end % 60:02d}"
+        }
+
+
+class Job:
+    """Запланированное развертывание: разовое (cron=None) или повторяющееся"""
+    def __init__(self, job_id, files, next_run, cron=None, clients=None):
+        self.id = job_id
+        self.files = list(files)
+        self.next_run = next_run
+        self.cron = CronExpression(cron) if cron else None
+        self.clients = list(clients) if clients is not None else None
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "files": self.files,
+            "next_run": datetime.fromtimestamp(self.next_run).isoformat(timespec='seconds'),
+            "cron": self.cron.expr if self.cron else None,
+            "clients": self.clients
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        next_run = datetime.fromisoformat(data['next_run']).timestamp()
+        return cls(data['id'], data['files'], next_run, data.get('cron'), data.get('clients'))
+
+
+def _is_str_list(value):
+    return isinstance(value, list) and all(isinstance(x, str) for x in value)
+
+
+class Scheduler:
+    """
+    Планировщик развертываний на event loop мастера.
+    Задания хранятся в двоичной куче по времени срабатывания: одна задача asyncio
+    спит до ближайшего срабатывания, поэтому ожидающие задания ничего не стоят.
+    Состояние сохраняется в JSON-файл после каждого изменения.
+    """
+    def __init__(self, logger: logging.Logger, path, on_fire):
+        self.logger = logger
+        self.path = path
+        self.on_fire = on_fire
+        self.jobs = dict()
+        self.windows = dict()
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self.load()
+
+    # Добавление разового (at) или повторяющегося (cron) задания
+    def add(self, files, at: datetime = None, cron: str = None, clients=None, save=True):
+        if (at is None) == (cron is None):
+            raise ValueError("Exactly one of 'at' or 'cron' must be given")
+        if not _is_str_list(files):
+            raise ValueError("'files' must be a list of strings")
+        if clients is not None and not _is_str_list(clients):
+            raise ValueError("'clients' must be a list of strings")
+        if cron is not None and not isinstance(cron, str):
+            raise ValueError("'cron' must be a string")
+        if at is not None:
+            next_run = at.timestamp()
+            job = Job(uuid.uuid4().hex, files, next_run, None, clients)
+        else:
+            job = Job(uuid.uuid4().hex, files, 0, cron, clients)
+            job.next_run = job.cron.next_after(datetime.now()).timestamp()
+        self._push(job)
+        if save:
+            self.save()
+        return job
+
+    def remove(self, job_id):
+        # запись в куче остаётся и будет пропущена при извлечении
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            self.save()
+        return job is not None
+
+    def set_window(self, client, start, end):
+        if start is None:
+            self.windows.pop(client, None)
+        else:
+            self.windows[client] = MaintenanceWindow(start, end)
+        self.save()
+
+    # Разделение клиентов на тех, у кого окно открыто сейчас, и отложенных до открытия окна
+    def split_by_window(self, clients, now: datetime):
+        ready = list()
+        deferred = dict()
+        for client in clients:
+            window = self.windows.get(client)
+            if window is None or window.is_open(now):
+                ready.append(client)
+            else:
+                deferred.setdefault(window.next_open(now), list()).append(client)
+        return ready, deferred
+
+    def _push(self, job: Job):
+        self.jobs[job.id] = job
+        heapq.heappush(self._heap, (job.next_run, job.id))
+        self._wakeup.set()
+
+    # Основной цикл планировщика
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = MAX_SLEEP
+            if self._heap:
+                timeout = min(max(self._heap[0][0] - time.time(), 0), MAX_SLEEP)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            await self._fire_due()
+
+    async def _fire_due(self):
+        now = time.time()
+        changed = False
+        while self._heap and self._heap[0][0] <= now:
+            next_run, job_id = heapq.heappop(self._heap)
+            job = self.jobs.get(job_id)
+            if job is None or job.next_run != next_run:
+                continue
+            changed = True
+            if job.cron:
+                job.next_run = job.cron.next_after(datetime.now()).timestamp()
+                heapq.heappush(self._heap, (job.next_run, job.id))
+            else:
+                del self.jobs[job_id]
+            self.logger.info(f"Scheduled job {job_id} fired: {job.files}")
+            try:
+                await self.on_fire(job)
+            except Exception:
+                self.logger.exception(f"Scheduled job {job_id} failed")
+        if changed:
+            self.save()
+
+    # Сохранение состояния (атомарная запись через временный файл)
+    def save(self):
+        state = {
+            "jobs": [job.as_dict() for job in self.jobs.values()],
+            "windows": {client: w.as_dict() for client, w in self.windows.items()}
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"Failed to save schedule to {self.path}: {e}")
+
+    # Загрузка состояния; пропущенные за время простоя разовые задания сработают сразу
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Failed to load schedule from {self.path}: {e}")
+            return
+        # повреждённая запись пропускается, остальные загружаются
+        for client, w in state.get('windows', {}).items():
+            try:
+                self.windows[client] = MaintenanceWindow(w['start'], w['end'])
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.logger.error(f"Skipping invalid maintenance window for {client}: {e}")
+        for data in state.get('jobs', []):
+            try:
+                job = Job.from_dict(data)
+                if job.cron and job.next_run < time.time():
+                    job.next_run = job.cron.next_after(datetime.now()).timestamp()
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.logger.error(f"Skipping invalid scheduled job {data}: {e}")
+                continue
+            self._push(job)
+        self.logger.info(f"Loaded {len(self.jobs)} scheduled jobs from {self.path}")
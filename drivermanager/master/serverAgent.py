@@ -2,6 +2,8 @@ import asyncio
 from webServer import *
 from httpServer import *
 from serverConfig import *
+from scheduler import Scheduler
+from datetime import datetime, timedelta
 import fileManager as fm
 import logging
 
@@ -12,11 +14,17 @@ class ServerAgent:
     def __init__(self, host, web_port, http_port):
         self.http = HttpServer(self.logger, host, http_port)
         self.web = WebServer(self.logger, host, web_port)
+        self.scheduler = Scheduler(self.logger, SCHEDULE_FILE, self.run_job)
         self.http.setup_post('/install-drivers', self.install_drivers)
+        self.http.setup_post('/schedule', self.schedule)
+        self.http.setup_post('/unschedule', self.unschedule)
+        self.http.setup_post('/maintenance-window', self.maintenance_window)
+        self.http.setup_get('/schedules', self.schedules)
+        self.http.setup_get('/clients', self.clients)
     
     # Запуск приложения
     async def start(self):
-        await asyncio.gather(self.web.start(), self.http.start())
+        await asyncio.gather(self.web.start(), self.http.start(), self.scheduler.run())
 
     # Завершение приложения
     def terminate(self):
@@ -27,9 +35,87 @@ class ServerAgent:
     async def install_drivers(self, request):
         data = await request.json()
         self.logger.info(request)
-        files = data['files']
+        response = await self.deploy(data['files'])
+        return web.Response(text=response, status=200)
+
+    # Рассылка файлов клиентам (всем или только из списка имён clients).
+    # Пропущенным клиентам рассылка повторяется через DEPLOY_RETRY_DELAY отдельным заданием планировщика
+    async def deploy(self, files, clients=None, save=True):
         response = ""
+        started = set()
+        skipped = dict()
         for file in files:
-            i = await self.web.broadcast(json.dumps({'file': file}), fm.target_os(file))
-            response += f"File \"{file}\" sent to {i} clients\n"
-        return web.Response(text=response, status=200)
\ No newline at end of file
+            message = {'file': file}
+            try:
+                message['manifest'] = await asyncio.to_thread(fm.manifest, file)
+                self.http.payloads.publish(file)
+            except OSError as e:
+                self.logger.warning(f"Cannot build manifest for \"{file}\", clients will skip verification: {e}")
+            stats = await self.web.broadcast(json.dumps(message), fm.target_os(file), clients, started)
+            response += (f"File \"{file}\" sent to {stats['sent']} clients "
+                         f"(skipped: {stats['busy']} busy, {stats['unhealthy']} unreachable, {stats['failed']} failed)\n")
+            for name in stats['skipped']:
+                skipped.setdefault(name, list()).append(file)
+        return response + self.retry_skipped(skipped, save)
+
+    # Планирование повторной рассылки пропущенным клиентам, сгруппированным по набору файлов
+    def retry_skipped(self, skipped, save=True):
+        response = ""
+        unnamed = skipped.pop(None, None)
+        if unnamed:
+            response += f"{len(unnamed)} skipped deliveries to clients without a name cannot be retried\n"
+        groups = dict()
+        for name, files in skipped.items():
+            groups.setdefault(tuple(files), list()).append(name)
+        at = datetime.now() + timedelta(seconds=DEPLOY_RETRY_DELAY)
+        for files, names in groups.items():
+            job = self.scheduler.add(list(files), at=at, clients=names, save=save)
+            response += f"Retry {job.id} scheduled at {at:%Y-%m-%d %H:%M:%S} for {len(names)} skipped clients\n"
+        return response
+
+    # Срабатывание задания планировщика с учётом окон обслуживания клиентов
+    async def run_job(self, job):
+        clients = job.clients if job.clients is not None else self.web.client_names()
+        ready, deferred = self.scheduler.split_by_window(clients, datetime.now())
+        for opens_at, waiting in deferred.items():
+            self.scheduler.add(job.files, at=opens_at, clients=waiting, save=False)
+            self.logger.info(f"Job {job.id} deferred for {len(waiting)} clients until {opens_at}")
+        if ready:
+            self.logger.info(await self.deploy(job.files, ready, save=False))
+
+    # POST-эндпоинт: {"files": [...], "at": "2025-01-01T03:00" | "cron": "0 3 * * 6", "clients": [...]}
+    async def schedule(self, request):
+        data = await request.json()
+        try:
+            at = datetime.fromisoformat(data['at']) if data.get('at') else None
+            job = self.scheduler.add(data['files'], at, data.get('cron'), data.get('clients'))
+        except (KeyError, ValueError, TypeError) as e:
+            return web.Response(text=f"Invalid schedule: {e}", status=400)
+        return web.json_response(job.as_dict())
+
+    # POST-эндпоинт: {"id": "..."}
+    async def unschedule(self, request):
+        data = await request.json()
+        if not self.scheduler.remove(data.get('id')):
+            return web.Response(text="Job not found", status=404)
+        return web.Response(text="Job removed", status=200)
+
+    # POST-эндпоинт: {"client": "name", "start": "22:00", "end": "06:00"}; start=null удаляет окно
+    async def maintenance_window(self, request):
+        data = await request.json()
+        try:
+            self.scheduler.set_window(data['client'], data.get('start'), data.get('end'))
+        except (KeyError, ValueError, AttributeError) as e:
+            return web.Response(text=f"Invalid maintenance window: {e}", status=400)
+        return web.Response(text="Maintenance window updated", status=200)
+
+    # GET-эндпоинт со списком заданий и окон обслуживания
+    async def schedules(self, request):
+        return web.json_response({
+            "jobs": [job.as_dict() for job in self.scheduler.jobs.values()],
+            "windows": {client: w.as_dict() for client, w in self.scheduler.windows.items()}
+        })
+
+    # GET-эндпоинт с состоянием клиентов по данным heartbeat
+    async def clients(self, request):
+        return web.json_response(self.web.health_report())
\ No newline at end of file
@@ -1,3 +1,8 @@
 HOST='localhost'
 WEB_PORT=8765
-HTTP_PORT=8766
\ No newline at end of file
+HTTP_PORT=8766
+SCHEDULE_FILE='schedule.json'
+# Через сколько секунд повторить рассылку клиентам, пропущенным из-за занятости или недоступности
+DEPLOY_RETRY_DELAY=300
+# Лимит суммарного размера файлов, одновременно отображённых в память для раздачи
+PAYLOAD_CACHE_BYTES=4*1024*1024*1024
\ No newline at end of file
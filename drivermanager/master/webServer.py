@@ -1,8 +1,35 @@
 import asyncio
+import time
 import websockets
 import json
 import logging
 
+# Границы интервала heartbeat клиентов (сек) и целевая суммарная частота heartbeat на мастер (сообщений/сек)
+HEARTBEAT_MIN_INTERVAL = 5.0
+HEARTBEAT_MAX_INTERVAL = 120.0
+HEARTBEAT_TARGET_RATE = 100.0
+# Сколько интервалов подряд можно пропустить до пометки клиента недоступным
+HEARTBEAT_MISSES = 3
+# Во сколько раз дольше ждать до принудительного закрытия молчащего соединения
+HEARTBEAT_DEAD_FACTOR = 2
+
+class ClientHealth:
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.cpu = None
+        self.disk_free = None
+        self.busy = False
+        self.healthy = True
+
+    def as_dict(self):
+        return {
+            "last_seen": round(time.monotonic() - self.last_seen, 1),
+            "cpu": self.cpu,
+            "disk_free": self.disk_free,
+            "busy": self.busy,
+            "healthy": self.healthy
+        }
+
 class WebServer:
     def __init__(self, logger : logging.Logger, host = 'localhost', port=8765):
         self.logger = logger
@@ -10,27 +37,57 @@ class WebServer:
         self.port = port
         self.connected_clients = set()
         self.client_os = dict()
+        self.client_name = dict()
+        self.client_health = dict()
+        self.heartbeat_interval = HEARTBEAT_MIN_INTERVAL
 
-    # Отправка TCP-пейлоада всем сокетам с подходящей ОС   
-    async def broadcast(self, message, targetOs):
-        sent = 0
+    # Отправка TCP-пейлоада всем сокетам с подходящей ОС (и, если задано, из списка имён clients).
+    # Недоступные и занятые установкой клиенты пропускаются, их имена возвращаются в stats["skipped"].
+    # started - id клиентов, которым уже отправлены файлы этой же рассылки: они заняты ею же
+    # и ставят следующие файлы в свою очередь установки, поэтому не пропускаются
+    async def broadcast(self, message, targetOs, clients=None, started=None):
+        stats = {"sent": 0, "busy": 0, "unhealthy": 0, "failed": 0, "skipped": list()}
+        started = started if started is not None else set()
         tasks = list()
+        targets = list()
         for client in self.connected_clients:
-            if(self.client_os[id(client)] in targetOs):
-                task = asyncio.create_task(client.send(message))
-                tasks.append(task)
-                sent+=1
-        await asyncio.gather(*tasks)
-        return sent
-        
+            client_id = id(client)
+            if clients is not None and self.client_name.get(client_id) not in clients:
+                continue
+            if(self.client_os.get(client_id) not in targetOs):
+                continue
+            health = self.client_health[client_id]
+            if not health.healthy:
+                stats["unhealthy"] += 1
+                stats["skipped"].append(self.client_name.get(client_id))
+            elif health.busy and client_id not in started:
+                stats["busy"] += 1
+                stats["skipped"].append(self.client_name.get(client_id))
+            else:
+                tasks.append(asyncio.create_task(client.send(message)))
+                targets.append(client)
+        for client, result in zip(targets, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(result, Exception):
+                stats["failed"] += 1
+                stats["skipped"].append(self.client_name.get(id(client)))
+            else:
+                stats["sent"] += 1
+                started.add(id(client))
+                # клиент начнёт установку; уточнённое состояние придёт со следующим heartbeat
+                self.client_health[id(client)].busy = True
+        return stats
+
     # Обработка подключения сокета к серверу
     async def handle(self, websocket):
         self.connected_clients.add(websocket)
         client_id = id(websocket)
+        self.client_health[client_id] = ClientHealth()
         self.logger.info(f"Client {client_id} connected")
         try:
+            await self.update_heartbeat_interval(websocket)
             async for message in websocket:
                 json_msg = json.loads(message)
+                self.client_health[client_id].last_seen = time.monotonic()
                 await self.handle_handshake(client_id, json_msg)
         except websockets.exceptions.ConnectionClosed:
             self.logger.info(f"Client {client_id} disconnected")
@@ -39,19 +96,95 @@ class WebServer:
         finally:
             self.connected_clients.remove(websocket)
             self.client_os.pop(client_id, None)
-    
+            self.client_name.pop(client_id, None)
+            self.client_health.pop(client_id, None)
+            await self.update_heartbeat_interval()
+
     # Обработка хэндшейка от клиента
     async def handle_handshake(self, client_id, json):
+        if not isinstance(json, dict):
+            self.logger.info(f"Client {client_id} sent non-object message. Ignored")
+            return
         if 'os' in json:
             os = json['os']
             self.client_os[client_id] = os
             self.logger.info(f"Client {client_id} sent OS: {os}")
+        if 'name' in json:
+            self.client_name[client_id] = json['name']
+            self.logger.info(f"Client {client_id} sent name: {json['name']}")
+        if 'heartbeat' in json:
+            self.handle_heartbeat(client_id, json['heartbeat'])
+
+    # Обработка heartbeat: {"cpu": 0.35, "disk_free": 1234, "busy": false}
+    def handle_heartbeat(self, client_id, heartbeat):
+        if not isinstance(heartbeat, dict):
+            self.logger.info(f"Client {client_id} sent malformed heartbeat. Ignored")
+            return
+        health = self.client_health[client_id]
+        health.cpu = heartbeat.get('cpu')
+        health.disk_free = heartbeat.get('disk_free')
+        health.busy = bool(heartbeat.get('busy', False))
+        if not health.healthy:
+            health.healthy = True
+            self.logger.info(f"Client {client_id} is reachable again")
+
+    # Пересчёт интервала heartbeat под размер парка: суммарный поток не превышает HEARTBEAT_TARGET_RATE.
+    # Новому клиенту (websocket) интервал отправляется всегда, остальным - при заметном изменении
+    async def update_heartbeat_interval(self, websocket=None):
+        interval = len(self.connected_clients) / HEARTBEAT_TARGET_RATE
+        interval = min(max(interval, HEARTBEAT_MIN_INTERVAL), HEARTBEAT_MAX_INTERVAL)
+        message = json.dumps({'heartbeat_interval': interval})
+        if abs(interval - self.heartbeat_interval) > self.heartbeat_interval * 0.25:
+            self.logger.info(f"Heartbeat interval changed to {interval:.1f}s")
+            self.heartbeat_interval = interval
+            targets = [c for c in self.connected_clients if c is not websocket]
+            await asyncio.gather(*(c.send(message) for c in targets), return_exceptions=True)
+        if websocket is not None:
+            await websocket.send(json.dumps({'heartbeat_interval': self.heartbeat_interval}))
+
+    # Периодическая проверка heartbeat: молчащие клиенты помечаются недоступными, затем отключаются
+    async def monitor_health(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_MIN_INTERVAL)
+            timeout = self.heartbeat_interval * HEARTBEAT_MISSES
+            now = time.monotonic()
+            for client in list(self.connected_clients):
+                client_id = id(client)
+                health = self.client_health.get(client_id)
+                if health is None:
+                    continue
+                silence = now - health.last_seen
+                if silence > timeout * HEARTBEAT_DEAD_FACTOR:
+                    self.logger.info(f"Client {client_id} silent for {silence:.0f}s, closing connection")
+                    client.transport.abort()
+                elif silence > timeout and health.healthy:
+                    health.healthy = False
+                    self.logger.info(f"Client {client_id} missed heartbeats, marked unreachable")
+
+    # Имена всех подключённых клиентов, прошедших хэндшейк
+    def client_names(self):
+        return set(self.client_name.values())
+
+    # Сводка по доступности клиентов
+    def health_report(self):
+        clients = dict()
+        for client_id, health in self.client_health.items():
+            name = self.client_name.get(client_id, str(client_id))
+            clients[name] = dict(health.as_dict(), os=self.client_os.get(client_id))
+        healthy = [h for h in self.client_health.values() if h.healthy]
+        return {
+            "connected": len(self.client_health),
+            "reachable": len(healthy),
+            "busy": sum(1 for h in healthy if h.busy),
+            "heartbeat_interval": self.heartbeat_interval,
+            "clients": clients
+        }
 
     # Запуск веб сервера
     async def start(self):
         self.server = await websockets.serve(self.handle, self.host, self.port)
         self.logger.info(f"Web server started at {self.host}:{self.port}")
-        await self.server.serve_forever()
+        await asyncio.gather(self.server.serve_forever(), self.monitor_health())
 
     async def terminate(self):
         self.server.close()